@@ -0,0 +1,116 @@
+"""
+SNARE Request Executors
+=======================
+
+Keeps blocking work off the uvicorn event loop. Route handlers await:
+
+- run_blocking(): scraping (requests/Selenium) and SQLite writes, on a
+  bounded thread pool
+- score_listings(): anomaly detection, on the same thread pool by default or
+  on a process pool when SNARE_SCORING_PROCESSES > 0, so CPU-heavy scoring of
+  large search results can't hold the GIL against the scrapers
+
+Both enforce a per-call timeout. A timed-out call stops being awaited (the
+client gets a 504) but its worker finishes in the background, since threads
+can't be killed; the pool size therefore bounds how much abandoned work can
+pile up.
+
+Limits come from environment variables:
+
+    SNARE_IO_WORKERS          thread pool size (default 8)
+    SNARE_SCORING_PROCESSES   scoring processes, 0 = score on the thread pool (default 0)
+    SNARE_SCRAPE_TIMEOUT      seconds per scrape (default 180)
+    SNARE_DB_TIMEOUT          seconds per database write (default 30)
+    SNARE_SCORING_TIMEOUT     seconds per scoring call (default 60)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+IO_WORKERS = int(os.getenv("SNARE_IO_WORKERS", "8"))
+SCORING_PROCESSES = int(os.getenv("SNARE_SCORING_PROCESSES", "0"))
+SCRAPE_TIMEOUT = float(os.getenv("SNARE_SCRAPE_TIMEOUT", "180"))
+DB_TIMEOUT = float(os.getenv("SNARE_DB_TIMEOUT", "30"))
+SCORING_TIMEOUT = float(os.getenv("SNARE_SCORING_TIMEOUT", "60"))
+
+# Listings database shared with the scrapers (scoring processes open their own connections)
+LISTINGS_DB_PATH = "data/listings.db"
+
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="snare-io")
+_scoring_executor: Optional[ProcessPoolExecutor] = None
+
+# Detector owned by a scoring process, loaded once by the pool initializer
+_worker_detector = None
+
+
+async def run_blocking(fn: Callable[..., Any], *args, timeout: float = DB_TIMEOUT, **kwargs) -> Any:
+    """
+    Run a blocking call on the I/O thread pool and await its result.
+
+    Raises:
+        asyncio.TimeoutError: If the call takes longer than timeout seconds
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(IO_EXECUTOR, functools.partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout=timeout)
+
+
+def _init_scoring_worker(models_dir: str, db_path: str):
+    """Process pool initializer: load the models and open the duplicate indexes once."""
+    global _worker_detector
+    from db.duplicate_index import DuplicateIndex
+    from db.minhash_index import NearDuplicateIndex
+    from ml.anomaly_detector import SNAREAnomalyDetector
+
+    _worker_detector = SNAREAnomalyDetector(
+        models_dir,
+        duplicate_index=DuplicateIndex(db_path),
+        near_duplicate_index=NearDuplicateIndex(db_path)
+    )
+
+
+def _score_in_worker(listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _worker_detector.detect_anomalies(listings)
+
+
+def _get_scoring_executor(models_dir: str) -> ProcessPoolExecutor:
+    global _scoring_executor
+    if _scoring_executor is None:
+        _scoring_executor = ProcessPoolExecutor(
+            max_workers=SCORING_PROCESSES,
+            initializer=_init_scoring_worker,
+            initargs=(models_dir, LISTINGS_DB_PATH)
+        )
+    return _scoring_executor
+
+
+async def score_listings(detector, listings: List[Dict[str, Any]], timeout: float = SCORING_TIMEOUT) -> List[Dict[str, Any]]:
+    """
+    Score listings without blocking the event loop.
+
+    With SNARE_SCORING_PROCESSES > 0 the batch is pickled to a scoring
+    process that holds its own copy of the models. Duplicate features come
+    from the shared listings database; location clusters reflect the geo
+    index as of that process's start until the next retrain.
+
+    Raises:
+        asyncio.TimeoutError: If scoring takes longer than timeout seconds
+    """
+    if SCORING_PROCESSES <= 0:
+        return await run_blocking(detector.detect_anomalies, listings, timeout=timeout)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_get_scoring_executor(detector.models_dir), _score_in_worker, listings)
+    return await asyncio.wait_for(future, timeout=timeout)
+
+
+def shutdown_executors():
+    """Stop the pools; queued work is cancelled, running work finishes."""
+    global _scoring_executor
+    IO_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    if _scoring_executor is not None:
+        _scoring_executor.shutdown(wait=False, cancel_futures=True)
+        _scoring_executor = None
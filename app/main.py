@@ -1,6 +1,9 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.executors import shutdown_executors
 from app.routes.listings import router as listings_router
 from app.config import get_settings, get_cors_config, get_api_config
 
@@ -9,11 +12,18 @@ settings = get_settings()
 api_config = get_api_config()
 cors_config = get_cors_config()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the scraping/scoring pools with the server
+    shutdown_executors()
+
 # Create FastAPI app with configuration
 app = FastAPI(
     title=api_config["title"],
     description=api_config["description"],
-    version=api_config["version"]
+    version=api_config["version"],
+    lifespan=lifespan
 )
 
 # Add CORS middleware with configuration
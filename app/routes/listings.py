@@ -1,8 +1,11 @@
 # API endpoints (routers)
 # The logic for scraping, detecting, etc.
+import asyncio
+
 from fastapi import APIRouter, HTTPException
+from app.executors import run_blocking, score_listings, SCRAPE_TIMEOUT
 from app.models.listing import ListingRequest
-from app.scrapers.scrapeData import scrape_listing, save_scraped_data
+from app.scrapers.scrapeData import scrape_listing, save_scraped_data, DUPLICATE_INDEX, NEAR_DUPLICATE_INDEX
 from app.scrapers.extractFeatures import extractFeatures
 from ml.anomaly_detector import SNAREAnomalyDetector
 
@@ -11,7 +14,7 @@ print("Starting...")
 
 # Initialize the anomaly detector once when the module loads
 try:
-    anomaly_detector = SNAREAnomalyDetector()
+    anomaly_detector = SNAREAnomalyDetector(duplicate_index=DUPLICATE_INDEX, near_duplicate_index=NEAR_DUPLICATE_INDEX)
     print("SNARE anomaly detector initialized successfully")
 except Exception as e:
     print(f"Warning: Could not initialize anomaly detector: {e}")
@@ -21,18 +24,39 @@ except Exception as e:
 async def check_listing(request: ListingRequest):  
     print("Checking listing...")
     try:
-        # Step 1: Scrape the listing data from the URL
-        listing_list, source = scrape_listing(request.url)
+        # Step 1: Scrape the listing data from the URL (blocking I/O runs on the thread pool)
+        listing_list, source = await run_blocking(scrape_listing, request.url, timeout=SCRAPE_TIMEOUT)
         listing_data = listing_list[0] if listing_list else {}
         
-        save_scraped_data(listing_list, source)
+        await run_blocking(save_scraped_data, listing_list, source)
         print("\nScraped data saved to database")
         
+        # Newly stored listings join the location clusters they are scored against
+        if anomaly_detector:
+            await run_blocking(anomaly_detector.observe_listings, listing_list)
+        
         # Step 2: Detect anomalies in the scraped data using trained models
         anomaly_results = {}
+        batch_results = []
         if anomaly_detector and listing_data:
-            print("Analyzing listing for anomalies...")
-            anomaly_results = anomaly_detector.detect_anomaly(listing_data)
+            if len(listing_list) > 1:
+                # Search URLs return many listings: score them all in one vectorized pass
+                print(f"Analyzing {len(listing_list)} listings for anomalies...")
+                all_results = await score_listings(anomaly_detector, listing_list)
+                anomaly_results = all_results[0]
+                batch_results = [
+                    {
+                        "url": listing.get("url"),
+                        "name": listing.get("listing_name", "Unknown"),
+                        "is_suspicious": result.get("is_suspicious", False),
+                        "confidence_score": result.get("confidence_score", 0.0),
+                        "anomaly_score": result.get("anomaly_score", 0.0)
+                    }
+                    for listing, result in zip(listing_list, all_results)
+                ]
+            else:
+                print("Analyzing listing for anomalies...")
+                anomaly_results = (await score_listings(anomaly_detector, [listing_data]))[0]
             is_suspicious = anomaly_results.get("is_suspicious", False)
             print(f"Anomaly detection complete. Is suspicious: {is_suspicious}")
         else:
@@ -53,9 +77,12 @@ async def check_listing(request: ListingRequest):
             "anomaly_score": anomaly_results.get("anomaly_score", 0.0),
             "analysis": anomaly_results.get("feature_analysis", {}),
             "model_predictions": anomaly_results.get("model_predictions", {}),
-            "scraped_data": listing_data
+            "scraped_data": listing_data,
+            "batch_results": batch_results
         }
     
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Listing check timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -75,7 +102,7 @@ async def check_manual_listing(listing_data: dict):
         anomaly_results = {}
         if anomaly_detector and listing_data:
             print("Analyzing manual listing for anomalies...")
-            anomaly_results = anomaly_detector.detect_anomaly(listing_data)
+            anomaly_results = (await score_listings(anomaly_detector, [listing_data]))[0]
             is_suspicious = anomaly_results.get("is_suspicious", False)
             print(f"Manual anomaly detection complete. Is suspicious: {is_suspicious}")
         else:
@@ -99,6 +126,8 @@ async def check_manual_listing(listing_data: dict):
             "scraped_data": listing_data
         }
     
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Manual listing check timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -10,8 +10,12 @@ from app.scrapers.extractFeatures import extractFeatures
 
 # Import database functionality
 from db.database_setup import ListingsDatabase, migrate_from_json
+from db.duplicate_index import DuplicateIndex
+from db.minhash_index import NearDuplicateIndex
 
 DB = ListingsDatabase("data/listings.db")
+DUPLICATE_INDEX = DuplicateIndex("data/listings.db")
+NEAR_DUPLICATE_INDEX = NearDuplicateIndex("data/listings.db")
 JSON_FILE = Path("data/listings.json")  # Kept for backward compatibility
 
 
@@ -83,6 +87,10 @@ def save_scraped_data(scraped_data, src):
         # Insert into database
         successful = DB.insert_multiple_listings(scraped_data)
         
+        # Keep duplicate statistics and near-duplicate signatures in step with the stored listings
+        DUPLICATE_INDEX.add_listings(scraped_data)
+        NEAR_DUPLICATE_INDEX.add_listings(scraped_data)
+        
         if successful > 0:
             print(f"Successfully saved {successful} listings")
             
@@ -157,6 +165,12 @@ def main():
         help="Show database statistics"
     )
     
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Rebuild the duplicate and near-duplicate indexes from all stored listings"
+    )
+    
     parser.add_argument(
         "--search",
         type=str,
@@ -180,6 +194,16 @@ def main():
             print("JSON file not found at data/listings.json")
         return
     
+    # Handle duplicate index rebuild
+    if args.reindex:
+        print("Rebuilding duplicate indexes from stored listings...")
+        listings = DB.get_listings()
+        indexed = DUPLICATE_INDEX.rebuild(listings)
+        print(f"Indexed {indexed} listings for exact duplicates")
+        indexed = NEAR_DUPLICATE_INDEX.rebuild(listings)
+        print(f"Indexed {indexed} descriptions for near duplicates")
+        return
+    
     # Handle stats
     if args.stats:
         show_database_summary()
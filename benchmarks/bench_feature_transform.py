@@ -0,0 +1,59 @@
+"""
+Per-listing latency of the feature transform and detect_anomaly.
+
+Builds a synthetic artifact set (or uses --models-dir) and times:
+- the feature path detect_anomaly runs for one listing
+- detect_anomaly end to end for one listing
+- detect_anomalies over a batch, amortized per listing
+
+Usage:
+    python -m benchmarks.bench_feature_transform [--models-dir ml/] [--repeat 200]
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+
+from benchmarks.common import build_synthetic_artifacts, summarize, synthetic_listings, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models-dir", help="Artifact directory (default: train a synthetic set)")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed calls per measurement")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Listings per detect_anomalies call")
+    args = parser.parse_args()
+
+    from ml.anomaly_detector import SNAREAnomalyDetector
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        models_dir = args.models_dir or build_synthetic_artifacts(tmp)
+        detector = SNAREAnomalyDetector(models_dir)
+    pipeline = detector.feature_pipeline
+
+    listing = synthetic_listings(1, seed=7)[0]
+    batch = synthetic_listings(args.batch_size, seed=11)
+
+    if hasattr(pipeline, "transform"):
+        feature_path = lambda: pipeline.transform([listing])
+    else:
+        # Pre single-pass detectors engineered features twice per listing
+        feature_path = lambda: (pipeline.transform_and_scale(listing), pipeline.transform_listing(listing))
+
+    # The detector prints progress; keep it out of the report but inside the timing
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows.append(("feature transform (1 listing)", summarize(time_call(feature_path, args.repeat))))
+        rows.append(("detect_anomaly (1 listing)", summarize(time_call(lambda: detector.detect_anomaly(listing), args.repeat))))
+        if hasattr(detector, "detect_anomalies"):
+            batch_timings = time_call(lambda: detector.detect_anomalies(batch), max(3, args.repeat // 50), warmup=1)
+            rows.append((f"detect_anomalies (per listing, n={len(batch)})", summarize([t / len(batch) for t in batch_timings])))
+
+    print(f"{'measurement':<38}{'median ms':>12}{'p95 ms':>12}")
+    for name, stats in rows:
+        print(f"{name:<38}{stats['median_ms']:>12.3f}{stats['p95_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+LOF novelty-query latency as the training set grows.
+
+Training matrices are resampled (with small jitter) from the scaled features
+of synthetic listings, so they keep the mixed boolean/continuous structure of
+real data. For each size the script fits the novelty LOF the retraining path
+uses and times score_samples for a single listing and for a 1000-row batch.
+
+Usage:
+    python -m benchmarks.bench_lof [--sizes 10000 100000 1000000] [--algorithm kd_tree]
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import build_synthetic_artifacts, summarize, synthetic_listings, time_call
+
+
+def training_matrix(base: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Resample n rows from base with jitter so duplicates don't collapse k-NN distances."""
+    rows = base[rng.integers(0, len(base), size=n)]
+    return rows + rng.normal(0.0, 0.05, size=rows.shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--algorithm", default="kd_tree", choices=["kd_tree", "ball_tree", "brute"])
+    parser.add_argument("--repeat", type=int, default=200, help="Timed single-row queries per size")
+    args = parser.parse_args()
+
+    from ml.anomaly_detector import SNAREAnomalyDetector
+    from ml.retrain import fit_novelty_lof
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        pipeline = SNAREAnomalyDetector(build_synthetic_artifacts(tmp)).feature_pipeline
+    base = np.nan_to_num(pipeline.transform(synthetic_listings(5000, seed=1)).X_scaled)
+    queries = np.nan_to_num(pipeline.transform(synthetic_listings(1000, seed=2)).X_scaled)
+    rng = np.random.default_rng(0)
+
+    print(f"{'train rows':>12}{'fit s':>10}{'1-row median ms':>18}{'1-row p95 ms':>15}{'batch us/row':>15}")
+    for size in args.sizes:
+        X_train = training_matrix(base, size, rng)
+
+        start = time.perf_counter()
+        lof = fit_novelty_lof(X_train, algorithm=args.algorithm)
+        fit_seconds = time.perf_counter() - start
+
+        single = summarize(time_call(lambda: lof.score_samples(queries[:1]), args.repeat))
+        batch = min(time_call(lambda: lof.score_samples(queries), 3, warmup=1))
+
+        print(f"{size:>12,}{fit_seconds:>10.1f}{single['median_ms']:>18.3f}{single['p95_ms']:>15.3f}"
+              f"{batch / len(queries) * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
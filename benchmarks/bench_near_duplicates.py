@@ -0,0 +1,87 @@
+"""
+Near-duplicate index cost and recall.
+
+Indexes synthetic listings into a throwaway SQLite file and reports the
+per-listing insert cost (signature plus band rows) and lookup cost as the
+corpus grows. It then plants lightly edited copies of one scam template (new
+phone number, price and city) and compares how many of them exact-text
+grouping and the MinHash index each connect.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates [--sizes 10000 100000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import synthetic_listings
+from db.duplicate_index import DuplicateIndex
+from db.minhash_index import NearDuplicateIndex
+
+TEMPLATE = ("Beautiful 2 bedroom apartment in {city}, all utilities included. I am currently out of "
+            "the country for missionary work so I can't show it in person. Send the deposit by wire "
+            "transfer and I will mail you the keys. Text me at {phone} for the application. ${price}/month")
+CITIES = ["Miami", "Tampa", "Orlando", "Jacksonville", "Gainesville", "Tallahassee"]
+
+
+def edited_copies(n: int, seed: int = 0):
+    """n copies of TEMPLATE with a different phone number, price and city each."""
+    rng = random.Random(seed)
+    return [
+        {
+            "url": f"https://example.org/template/{i}",
+            "listing_name": f"Template listing {i}",
+            "price": rng.randint(600, 2500),
+            "description": TEMPLATE.format(
+                city=rng.choice(CITIES),
+                phone=f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+                price=rng.randint(600, 2500)
+            )
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    queries = synthetic_listings(args.queries, seed=7)
+
+    print(f"{'corpus':>10}{'insert us/listing':>20}{'lookup us/listing':>20}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = NearDuplicateIndex(os.path.join(tmp, "listings.db"))
+            corpus = synthetic_listings(size, seed=size)
+
+            start = time.perf_counter()
+            for begin in range(0, size, 1000):
+                index.add_listings(corpus[begin:begin + 1000])
+            insert = (time.perf_counter() - start) / size
+
+            start = time.perf_counter()
+            index.lookup(queries)
+            lookup = (time.perf_counter() - start) / len(queries)
+
+            print(f"{size:>10,}{insert * 1e6:>20.1f}{lookup * 1e6:>20.1f}")
+
+    copies = edited_copies(50)
+    exact = DuplicateIndex(":memory:")
+    exact.add_listings(copies)
+    near = NearDuplicateIndex(":memory:")
+    near.add_listings(copies)
+
+    exact_counts = [row["desc_dup_count"] for row in exact.lookup(copies)]
+    near_counts = [row["near_dup_count"] for row in near.lookup(copies)]
+    print(f"\n{len(copies)} edited copies of one template")
+    print(f"  exact grouping: mean group size {sum(exact_counts) / len(copies):.1f}")
+    print(f"  MinHash/LSH:    mean group size {sum(near_counts) / len(copies):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Latency of a running SNARE API under concurrent clients.
+
+Each of --clients threads posts --requests listings back to back, while a
+probe thread polls GET / (which does no work) to show whether the event loop
+stays responsive. By default clients hit /check_manual_listing with synthetic
+listings, so no scraping is involved; pass --url to exercise /check_listing
+against a real listing or search URL instead.
+
+Run it against the server before and after a change, e.g.:
+
+    python run_server.py &
+    python -m benchmarks.load_test --clients 50 --requests 10
+
+Usage:
+    python -m benchmarks.load_test [--base-url http://localhost:8000] [--clients 50]
+                                   [--requests 10] [--url LISTING_URL]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import requests
+
+from benchmarks.common import synthetic_listings
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p99/max in milliseconds."""
+    if not latencies:
+        return {"p50_ms": float("nan"), "p99_ms": float("nan"), "max_ms": float("nan")}
+    values = np.array(latencies) * 1e3
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99)),
+            "max_ms": float(values.max())}
+
+
+def run_client(base_url: str, payloads: List[dict], url: str, timeout: float) -> tuple:
+    latencies, errors = [], 0
+    with requests.Session() as session:
+        for payload in payloads:
+            start = time.perf_counter()
+            try:
+                if url:
+                    response = session.post(f"{base_url}/check_listing", json={"url": url}, timeout=timeout)
+                else:
+                    response = session.post(f"{base_url}/check_manual_listing", json=payload, timeout=timeout)
+                if response.status_code != 200:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def run_probe(base_url: str, stop: threading.Event, interval: float, latencies: List[float]):
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f"{base_url}/", timeout=60)
+            except requests.RequestException:
+                pass
+            latencies.append(time.perf_counter() - start)
+            stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+    parser.add_argument("--url", default="", help="Listing URL for /check_listing (default: manual listings)")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.clients * args.requests, seed=11)
+    batches = [listings[i::args.clients] for i in range(args.clients)]
+
+    probe_latencies: List[float] = []
+    stop = threading.Event()
+    probe = threading.Thread(target=run_probe, args=(args.base_url, stop, 0.05, probe_latencies), daemon=True)
+
+    start = time.perf_counter()
+    probe.start()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        outcomes = list(pool.map(lambda batch: run_client(args.base_url, batch, args.url, args.timeout), batches))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    probe.join()
+
+    latencies = [latency for client_latencies, _ in outcomes for latency in client_latencies]
+    errors = sum(client_errors for _, client_errors in outcomes)
+    endpoint = "/check_listing" if args.url else "/check_manual_listing"
+
+    print(f"{args.clients} clients x {args.requests} requests against {args.base_url}{endpoint}")
+    print(f"  throughput: {len(latencies) / elapsed:.1f} req/s, errors: {errors}")
+    for name, stats in ((endpoint, percentiles(latencies)), ("GET / probe", percentiles(probe_latencies))):
+        print(f"  {name:<22} p50 {stats['p50_ms']:>9.1f} ms   p99 {stats['p99_ms']:>9.1f} ms   max {stats['max_ms']:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
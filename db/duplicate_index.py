@@ -0,0 +1,272 @@
+"""
+SNARE Duplicate Index
+=====================
+
+Incremental replacement for the notebook's corpus-wide groupby duplicate
+features. Every stored listing updates running statistics keyed on a hash of
+its normalized description and of its normalized listing name:
+
+- how many listings share the key
+- count, mean and M2 (Welford) of price and square footage
+
+so name_dup_count, desc_dup_count, price_std_in_desc, sqft_std_in_desc and
+desc_mismatch_flag become O(1) primary-key lookups at inference time.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+DESC_KEY = "desc"
+NAME_KEY = "name"
+
+# SQLite's default bound-parameter limit is 999 on older builds
+_QUERY_CHUNK = 400
+
+
+def normalize_text(text: Any) -> str:
+    """Normalize text the way the notebook builds desc_clean."""
+    if text is None or (isinstance(text, float) and math.isnan(text)):
+        return ""
+    return str(text).lower().strip()
+
+
+def text_hash(text: str) -> int:
+    """Stable signed 64-bit hash, so keys fit an SQLite INTEGER."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def listing_key(listing: Dict[str, Any]) -> int:
+    """Identity of a listing: its URL, or a content fingerprint when it has none."""
+    url = listing.get("url")
+    if isinstance(url, str) and url and url != "manual_entry":
+        return text_hash(url)
+    # Normalized so raw scraper values and pipeline-converted values agree
+    fingerprint = json.dumps([
+        normalize_text(listing.get("listing_name")),
+        normalize_text(listing.get("description")),
+        *(to_float(listing.get(field)) for field in ("price", "square_footage", "latitude", "longitude"))
+    ])
+    return text_hash(fingerprint)
+
+
+def to_float(value: Any) -> Optional[float]:
+    """Finite float value, or None for missing/non-numeric input."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+class _RunningStats:
+    """Count plus Welford mean/M2 for price and square footage."""
+
+    __slots__ = ("count", "price_n", "price_mean", "price_m2", "sqft_n", "sqft_mean", "sqft_m2")
+
+    def __init__(self, count=0, price_n=0, price_mean=0.0, price_m2=0.0, sqft_n=0, sqft_mean=0.0, sqft_m2=0.0):
+        self.count = count
+        self.price_n, self.price_mean, self.price_m2 = price_n, price_mean, price_m2
+        self.sqft_n, self.sqft_mean, self.sqft_m2 = sqft_n, sqft_mean, sqft_m2
+
+    def add(self, price: Optional[float], sqft: Optional[float]) -> "_RunningStats":
+        self.count += 1
+        if price is not None:
+            self.price_n += 1
+            delta = price - self.price_mean
+            self.price_mean += delta / self.price_n
+            self.price_m2 += delta * (price - self.price_mean)
+        if sqft is not None:
+            self.sqft_n += 1
+            delta = sqft - self.sqft_mean
+            self.sqft_mean += delta / self.sqft_n
+            self.sqft_m2 += delta * (sqft - self.sqft_mean)
+        return self
+
+    def copy(self) -> "_RunningStats":
+        return _RunningStats(*(getattr(self, slot) for slot in self.__slots__))
+
+    @staticmethod
+    def _std(n: int, m2: float) -> float:
+        # Sample standard deviation, like pandas' groupby std
+        return math.sqrt(max(m2, 0.0) / (n - 1)) if n > 1 else float("nan")
+
+    @property
+    def price_std(self) -> float:
+        return self._std(self.price_n, self.price_m2)
+
+    @property
+    def sqft_std(self) -> float:
+        return self._std(self.sqft_n, self.sqft_m2)
+
+    def as_row(self, kind: str, key: int) -> tuple:
+        return (kind, key) + tuple(getattr(self, slot) for slot in self.__slots__)
+
+
+class DuplicateIndex:
+    """Running duplicate statistics per description/name hash, stored in SQLite."""
+
+    def __init__(self, db_path: str = "data/listings.db"):
+        """Open (or create) the index tables in the database at db_path."""
+        self.db_path = db_path
+        if db_path != ":memory:" and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS duplicate_stats (
+                    kind TEXT NOT NULL,
+                    key_hash INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    price_n INTEGER NOT NULL,
+                    price_mean REAL NOT NULL,
+                    price_m2 REAL NOT NULL,
+                    sqft_n INTEGER NOT NULL,
+                    sqft_mean REAL NOT NULL,
+                    sqft_m2 REAL NOT NULL,
+                    PRIMARY KEY (kind, key_hash)
+                ) WITHOUT ROWID
+            """)
+            # Listings already counted, so re-saving a listing never inflates counts
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS duplicate_members (
+                    listing_key INTEGER PRIMARY KEY
+                )
+            """)
+
+    def _fetch_stats(self, kind: str, keys: Iterable[int]) -> Dict[int, _RunningStats]:
+        keys = list(set(keys))
+        stats = {}
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key_hash, count, price_n, price_mean, price_m2, sqft_n, sqft_mean, sqft_m2 "
+                f"FROM duplicate_stats WHERE kind = ? AND key_hash IN ({','.join('?' * len(chunk))})",
+                [kind, *chunk]
+            ).fetchall()
+            for key, *values in rows:
+                stats[key] = _RunningStats(*values)
+        return stats
+
+    def _fetch_members(self, keys: Iterable[int]) -> set:
+        keys = list(set(keys))
+        members = set()
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT listing_key FROM duplicate_members WHERE listing_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            members.update(row[0] for row in rows)
+        return members
+
+    def add_listings(self, listings: List[Dict[str, Any]]) -> int:
+        """
+        Fold newly stored listings into the running statistics.
+
+        Listings that were already counted are skipped. Returns the number of
+        listings added.
+        """
+        if not listings:
+            return 0
+
+        with self._lock, self._conn:
+            keys = [listing_key(listing) for listing in listings]
+            members = self._fetch_members(keys)
+
+            new_listings = []
+            for key, listing in zip(keys, listings):
+                if key not in members:
+                    members.add(key)
+                    new_listings.append((key, listing))
+            if not new_listings:
+                return 0
+
+            desc_keys = [text_hash(normalize_text(listing.get("description"))) for _, listing in new_listings]
+            name_keys = [text_hash(normalize_text(listing.get("listing_name"))) for _, listing in new_listings]
+            desc_stats = self._fetch_stats(DESC_KEY, desc_keys)
+            name_stats = self._fetch_stats(NAME_KEY, name_keys)
+
+            for (_, listing), desc_key, name_key in zip(new_listings, desc_keys, name_keys):
+                price = to_float(listing.get("price"))
+                sqft = to_float(listing.get("square_footage"))
+                desc_stats.setdefault(desc_key, _RunningStats()).add(price, sqft)
+                name_stats.setdefault(name_key, _RunningStats()).add(price, sqft)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO duplicate_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [stats.as_row(DESC_KEY, key) for key, stats in desc_stats.items()]
+                + [stats.as_row(NAME_KEY, key) for key, stats in name_stats.items()]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO duplicate_members (listing_key) VALUES (?)",
+                [(key,) for key, _ in new_listings]
+            )
+            return len(new_listings)
+
+    def lookup(self, listings: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """
+        Duplicate features for each listing, as if it were part of the corpus.
+
+        Stored listings read their key's statistics directly; a listing that
+        has not been stored (e.g. a manual entry) is folded in on the fly so
+        it counts itself exactly once.
+        """
+        if not listings:
+            return []
+
+        with self._lock:
+            keys = [listing_key(listing) for listing in listings]
+            members = self._fetch_members(keys)
+            desc_keys = [text_hash(normalize_text(listing.get("description"))) for listing in listings]
+            name_keys = [text_hash(normalize_text(listing.get("listing_name"))) for listing in listings]
+            desc_stats = self._fetch_stats(DESC_KEY, desc_keys)
+            name_stats = self._fetch_stats(NAME_KEY, name_keys)
+
+        results = []
+        for listing, key, desc_key, name_key in zip(listings, keys, desc_keys, name_keys):
+            desc = desc_stats.get(desc_key, _RunningStats())
+            name = name_stats.get(name_key, _RunningStats())
+            if key not in members:
+                price = to_float(listing.get("price"))
+                sqft = to_float(listing.get("square_footage"))
+                desc = desc.copy().add(price, sqft)
+                name = name.copy().add(price, sqft)
+
+            # Blank text is missing data, not a duplicate of other blank listings
+            if not normalize_text(listing.get("description")):
+                desc = _RunningStats().add(None, None)
+            if not normalize_text(listing.get("listing_name")):
+                name = _RunningStats().add(None, None)
+
+            results.append({
+                "name_dup_count": max(name.count, 1),
+                "desc_dup_count": max(desc.count, 1),
+                "price_std_in_desc": desc.price_std,
+                "sqft_std_in_desc": desc.sqft_std
+            })
+        return results
+
+    def rebuild(self, listings: Iterable[Dict[str, Any]], batch_size: int = 5000) -> int:
+        """Reset the index and rebuild it from every stored listing."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM duplicate_stats")
+            self._conn.execute("DELETE FROM duplicate_members")
+
+        total = 0
+        batch = []
+        for listing in listings:
+            batch.append(listing)
+            if len(batch) >= batch_size:
+                total += self.add_listings(batch)
+                batch = []
+        return total + self.add_listings(batch)
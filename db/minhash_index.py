@@ -0,0 +1,248 @@
+"""
+SNARE Near-Duplicate Index
+==========================
+
+MinHash signatures plus LSH banding over listing descriptions, stored next to
+the listings. Exact-text grouping misses scam templates that were lightly
+edited (new phone number, price or city); MinHash estimates the Jaccard
+similarity of character 5-gram shingles, and banding finds candidate matches
+with a handful of bucket lookups instead of an all-pairs comparison.
+
+Each indexed listing costs one signature (a few dozen microseconds of NumPy)
+and one row per band. Lookups return the near-duplicate cluster size and the
+price spread inside it.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from db.duplicate_index import listing_key, normalize_text, to_float
+
+NUM_PERM = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+
+# Universal hashing (a * x + b) mod p with p just above 2**32; a < 2**31 keeps
+# the product inside uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# SQLite's default bound-parameter limit is 999 on older builds
+_QUERY_CHUNK = 400
+
+
+def shingles(text: Any, size: int = 5) -> np.ndarray:
+    """
+    Distinct CRC32 hashes of the character n-grams of normalized text.
+
+    Character shingles over the word tokens tolerate small edits far better
+    than word n-grams: swapping a phone number or city only disturbs the
+    handful of shingles that overlap it.
+    """
+    text = ' '.join(_TOKEN_PATTERN.findall(normalize_text(text)))
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    grams = {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signature(text: Any) -> Optional[np.ndarray]:
+    """NUM_PERM-long MinHash signature of text, or None when it has no words."""
+    hashes = shingles(text)
+    if len(hashes) == 0:
+        return None
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket id per LSH band."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes(), digest_size=8).digest(),
+            "big", signed=True
+        )
+        for band in range(NUM_BANDS)
+    ]
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of listing descriptions, stored in SQLite."""
+
+    def __init__(self, db_path: str = "data/listings.db", threshold: float = 0.5, max_candidates: int = 2000):
+        """
+        Open (or create) the index tables in the database at db_path.
+
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway index)
+            threshold: Minimum estimated Jaccard similarity for a near duplicate
+            max_candidates: Cap on LSH candidates verified per listing
+        """
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        if db_path != ":memory:" and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS minhash_docs (
+                    listing_key INTEGER PRIMARY KEY,
+                    signature BLOB NOT NULL,
+                    price REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS minhash_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    listing_key INTEGER NOT NULL,
+                    PRIMARY KEY (band, bucket, listing_key)
+                ) WITHOUT ROWID
+            """)
+
+    def _existing_keys(self, keys: Iterable[int]) -> set:
+        keys = list(set(keys))
+        found = set()
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT listing_key FROM minhash_docs WHERE listing_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def add_listings(self, listings: List[Dict[str, Any]]) -> int:
+        """Index newly stored listings; already-indexed ones are skipped. Returns the number added."""
+        if not listings:
+            return 0
+
+        keys = [listing_key(listing) for listing in listings]
+        with self._lock, self._conn:
+            seen = self._existing_keys(keys)
+            docs, buckets = [], []
+            for key, listing in zip(keys, listings):
+                if key in seen:
+                    continue
+                seen.add(key)
+                signature = minhash_signature(listing.get("description"))
+                if signature is None:
+                    continue
+                docs.append((key, signature.tobytes(), to_float(listing.get("price"))))
+                buckets.extend((band, bucket, key) for band, bucket in enumerate(band_buckets(signature)))
+
+            self._conn.executemany("INSERT OR IGNORE INTO minhash_docs VALUES (?, ?, ?)", docs)
+            self._conn.executemany("INSERT OR IGNORE INTO minhash_buckets VALUES (?, ?, ?)", buckets)
+            return len(docs)
+
+    def _candidates(self, bucket_lists: List[List[int]]) -> List[set]:
+        """LSH candidates for each signature's bands, with one query per band."""
+        candidates = [set() for _ in bucket_lists]
+        for band in range(NUM_BANDS):
+            wanted: Dict[int, List[int]] = {}
+            for i, buckets in enumerate(bucket_lists):
+                if buckets:
+                    wanted.setdefault(buckets[band], []).append(i)
+            bucket_ids = list(wanted)
+            for start in range(0, len(bucket_ids), _QUERY_CHUNK):
+                chunk = bucket_ids[start:start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT bucket, listing_key FROM minhash_buckets "
+                    f"WHERE band = ? AND bucket IN ({','.join('?' * len(chunk))})",
+                    [band, *chunk]
+                ).fetchall()
+                members: Dict[int, List[int]] = {}
+                for bucket, key in rows:
+                    members.setdefault(bucket, []).append(key)
+                for bucket, keys in members.items():
+                    for i in wanted[bucket]:
+                        if len(candidates[i]) < self.max_candidates:
+                            candidates[i].update(keys[:self.max_candidates])
+        return candidates
+
+    def _documents(self, keys: Iterable[int]) -> tuple:
+        """Signature matrix, prices and row positions for the given listing keys."""
+        keys = list(keys)
+        positions, signatures, prices = {}, [], []
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT listing_key, signature, price FROM minhash_docs "
+                f"WHERE listing_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, signature, price in rows:
+                positions[key] = len(signatures)
+                signatures.append(np.frombuffer(signature, dtype=np.uint64))
+                prices.append(np.nan if price is None else price)
+        matrix = np.vstack(signatures) if signatures else np.empty((0, NUM_PERM), dtype=np.uint64)
+        return positions, matrix, np.array(prices, dtype=np.float64)
+
+    def lookup(self, listings: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """
+        Near-duplicate cluster size and price spread for each listing.
+
+        The cluster is every indexed listing whose estimated Jaccard
+        similarity to this description reaches the threshold, plus the
+        listing itself. near_dup_price_std is the sample standard deviation
+        of their prices (NaN with fewer than two prices).
+        """
+        signatures = [minhash_signature(listing.get("description")) for listing in listings]
+        bucket_lists = [band_buckets(signature) if signature is not None else [] for signature in signatures]
+        keys = [listing_key(listing) for listing in listings]
+
+        with self._lock:
+            candidates = self._candidates(bucket_lists)
+            positions, matrix, doc_prices = self._documents(set().union(*candidates)) if candidates else ({}, None, None)
+
+        results = []
+        for listing, key, signature, candidate_keys in zip(listings, keys, signatures, candidates):
+            if signature is None:
+                results.append({"near_dup_count": 1, "near_dup_price_std": float("nan")})
+                continue
+
+            rows = np.fromiter((positions[k] for k in candidate_keys), dtype=np.int64, count=len(candidate_keys))
+            similar = rows[(matrix[rows] == signature).mean(axis=1) >= self.threshold]
+            prices = doc_prices[similar]
+
+            count = len(similar)
+            # A listing that isn't indexed yet joins its own cluster
+            if key not in positions or positions[key] not in similar:
+                own_price = to_float(listing.get("price"))
+                prices = np.append(prices, np.nan if own_price is None else own_price)
+                count += 1
+
+            prices = prices[~np.isnan(prices)]
+            price_std = float(np.std(prices, ddof=1)) if len(prices) > 1 else float("nan")
+            results.append({"near_dup_count": count, "near_dup_price_std": price_std})
+        return results
+
+    def rebuild(self, listings: Iterable[Dict[str, Any]], batch_size: int = 5000) -> int:
+        """Reset the index and rebuild it from every stored listing."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM minhash_docs")
+            self._conn.execute("DELETE FROM minhash_buckets")
+
+        total = 0
+        batch = []
+        for listing in listings:
+            batch.append(listing)
+            if len(batch) >= batch_size:
+                total += self.add_listings(batch)
+                batch = []
+        return total + self.add_listings(batch)
@@ -16,11 +16,10 @@ import pandas as pd
 import joblib
 import json
 import os
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 from datetime import datetime
-from sklearn.cluster import DBSCAN
-
-from ml.feature_pipeline import SNAREFeaturePipeline
+from ml.dbscan_index import DBSCANCoreIndex, INDEX_FILENAME as DBSCAN_INDEX_FILENAME
+from ml.feature_pipeline import SNAREFeaturePipeline, FeatureTransformResult
 
 
 class SNAREAnomalyDetector:
@@ -34,15 +33,27 @@ class SNAREAnomalyDetector:
     - Ensemble: Consensus scoring across all models
     """
     
-    def __init__(self, models_dir: str = "ml/"):
-        """Initialize the anomaly detector with trained models."""
+    def __init__(self, models_dir: str = "ml/", duplicate_index=None, near_duplicate_index=None):
+        """
+        Initialize the anomaly detector with trained models.
+        
+        Args:
+            models_dir: Directory holding the trained artifacts
+            duplicate_index: Optional DuplicateIndex backing the duplicate features
+            near_duplicate_index: Optional NearDuplicateIndex backing the near-duplicate features
+        """
         self.models_dir = models_dir
-        self.feature_pipeline = SNAREFeaturePipeline(models_dir)
+        self.feature_pipeline = SNAREFeaturePipeline(
+            models_dir,
+            duplicate_index=duplicate_index,
+            near_duplicate_index=near_duplicate_index
+        )
         
         # Model components
         self.isolation_forest = None
         self.lof_model = None
         self.dbscan_params = None
+        self.dbscan_index = None
         self.model_metadata = {}
         
         self.load_models()
@@ -62,6 +73,10 @@ class SNAREAnomalyDetector:
             with open(os.path.join(self.models_dir, "dbscan_params.json"), 'r') as f:
                 self.dbscan_params = json.load(f)
             
+            # Load DBSCAN core-point index (written by retraining)
+            if os.path.exists(os.path.join(self.models_dir, DBSCAN_INDEX_FILENAME)):
+                self.dbscan_index = DBSCANCoreIndex.load(self.models_dir)
+            
             # Load model metadata for context
             with open(os.path.join(self.models_dir, "model_summary.json"), 'r') as f:
                 self.model_metadata = json.load(f)
@@ -71,6 +86,10 @@ class SNAREAnomalyDetector:
         except Exception as e:
             raise RuntimeError(f"Failed to load anomaly detection models: {str(e)}")
     
+    def observe_listings(self, listings: List[Dict[str, Any]]) -> int:
+        """Update incremental model state (location clusters) with newly stored listings."""
+        return self.feature_pipeline.observe_listings(listings)
+    
     def detect_anomaly(self, listing_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Detect if a listing is anomalous using ensemble of trained models.
@@ -81,54 +100,82 @@ class SNAREAnomalyDetector:
         Returns:
             Dictionary containing anomaly detection results
         """
+        return self.detect_anomalies([listing_data])[0]
+    
+    def detect_anomalies(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Detect anomalies for a batch of listings in one vectorized pass.
+        
+        Feature engineering, scaling and every model's inference run once over
+        the N-row matrix; only the per-listing result dicts are assembled row
+        by row. Each result is identical to calling detect_anomaly on that
+        listing alone.
+        
+        Args:
+            listings: Raw listing dicts from scraper
+            
+        Returns:
+            List of anomaly detection results, in the same order as listings
+        """
+        if not listings:
+            return []
+        
         try:
-            # Transform raw data into engineered features
-            X_scaled = self.feature_pipeline.transform_and_scale(listing_data)
-            df_features = self.feature_pipeline.transform_listing(listing_data)
+            # Engineer and scale features in a single pass
+            transformed = self.feature_pipeline.transform(listings)
             
             # Get predictions from all models
-            iso_result = self._predict_isolation_forest(X_scaled, df_features)
-            dbscan_result = self._predict_dbscan(X_scaled)
-            lof_result = self._predict_lof(X_scaled)
-            
-            # Ensemble scoring with feature data for business logic
-            ensemble_result = self._ensemble_scoring(iso_result, dbscan_result, lof_result, df_features)
-            
-            # Compile comprehensive results
-            results = {
-                "is_suspicious": ensemble_result["is_anomaly"],
-                "confidence_score": ensemble_result["confidence"],
-                "anomaly_score": ensemble_result["overall_score"],
-                "model_predictions": {
-                    "isolation_forest": {
-                        "is_anomaly": iso_result["is_anomaly"],
-                        "score": iso_result["score"],
-                        "prediction": iso_result["prediction"]
-                    },
-                    "dbscan": {
-                        "is_anomaly": dbscan_result["is_anomaly"],
-                        "cluster": dbscan_result["cluster"],
-                        "is_noise": dbscan_result["is_noise"]
+            iso_results = self._predict_isolation_forest(transformed)
+            dbscan_results = self._predict_dbscan(transformed.X_scaled)
+            lof_results = self._predict_lof(transformed.X_scaled)
+            
+            timestamp = datetime.now().isoformat()
+            feature_count = len(self.feature_pipeline.get_feature_names())
+            
+            results = []
+            for i, (iso_result, dbscan_result, lof_result) in enumerate(zip(iso_results, dbscan_results, lof_results)):
+                # Ensemble scoring with feature data for business logic
+                ensemble_result = self._ensemble_scoring(iso_result, dbscan_result, lof_result, transformed, i)
+                
+                # Compile comprehensive results
+                results.append({
+                    "is_suspicious": ensemble_result["is_anomaly"],
+                    "confidence_score": ensemble_result["confidence"],
+                    "anomaly_score": ensemble_result["overall_score"],
+                    "model_predictions": {
+                        "isolation_forest": {
+                            "is_anomaly": iso_result["is_anomaly"],
+                            "score": iso_result["score"],
+                            "prediction": iso_result["prediction"]
+                        },
+                        "dbscan": {
+                            "is_anomaly": dbscan_result["is_anomaly"],
+                            "cluster": dbscan_result["cluster"],
+                            "is_noise": dbscan_result["is_noise"]
+                        },
+                        "lof": {
+                            "is_anomaly": lof_result["is_anomaly"],
+                            "score": lof_result["score"],
+                            "prediction": lof_result["prediction"]
+                        }
                     },
-                    "lof": {
-                        "is_anomaly": lof_result["is_anomaly"],
-                        "score": lof_result["score"],
-                        "prediction": lof_result["prediction"]
+                    "feature_analysis": self._analyze_features(transformed, i),
+                    "processing_info": {
+                        "timestamp": timestamp,
+                        "models_used": ["isolation_forest", "dbscan", "lof"],
+                        "feature_count": feature_count
                     }
-                },
-                "feature_analysis": self._analyze_features(df_features),
-                "processing_info": {
-                    "timestamp": datetime.now().isoformat(),
-                    "models_used": ["isolation_forest", "dbscan", "lof"],
-                    "feature_count": len(self.feature_pipeline.get_feature_names())
-                }
-            }
+                })
             
             return results
             
         except Exception as e:
+            # Isolate the failing listing(s) so one bad row can't sink the batch
+            if len(listings) > 1:
+                return [self.detect_anomaly(listing) for listing in listings]
+            
             # Return safe fallback result on error
-            return {
+            return [{
                 "is_suspicious": False,
                 "confidence_score": 0.0,
                 "anomaly_score": 0.0,
@@ -137,83 +184,117 @@ class SNAREAnomalyDetector:
                     "timestamp": datetime.now().isoformat(),
                     "status": "error"
                 }
-            }
+            }]
     
-    def _predict_isolation_forest(self, X_scaled: np.ndarray, df_features: pd.DataFrame) -> Dict[str, Any]:
-        """Get Isolation Forest prediction."""
+    def _predict_isolation_forest(self, transformed: FeatureTransformResult) -> List[Dict[str, Any]]:
+        """Get Isolation Forest predictions for every row."""
         try:
             # Use original features (not scaled) for Isolation Forest
-            X_original = df_features.iloc[:1]  # First row as DataFrame
-            
-            prediction = self.isolation_forest.predict(X_original)[0]
-            score = self.isolation_forest.decision_function(X_original)[0]
-            
-            return {
-                "prediction": int(prediction),
-                "score": float(score),
-                "is_anomaly": prediction == -1
-            }
+            predictions = self.isolation_forest.predict(transformed.features)
+            scores = self.isolation_forest.decision_function(transformed.features)
+            
+            return [
+                {
+                    "prediction": int(prediction),
+                    "score": float(score),
+                    "is_anomaly": bool(prediction == -1)
+                }
+                for prediction, score in zip(predictions, scores)
+            ]
         except Exception as e:
-            return {
-                "prediction": 1,
-                "score": 0.0,
-                "is_anomaly": False,
-                "error": str(e)
-            }
+            return [
+                {
+                    "prediction": 1,
+                    "score": 0.0,
+                    "is_anomaly": False,
+                    "error": str(e)
+                }
+                for _ in range(len(transformed))
+            ]
     
-    def _predict_dbscan(self, X_scaled: np.ndarray) -> Dict[str, Any]:
-        """Get DBSCAN clustering prediction."""
+    def _predict_dbscan(self, X_scaled: np.ndarray) -> List[Dict[str, Any]]:
+        """Get DBSCAN cluster assignments for every row against the training core points."""
         try:
-            # Initialize DBSCAN with saved parameters
-            dbscan = DBSCAN(
-                eps=self.dbscan_params["eps"],
-                min_samples=self.dbscan_params["min_samples"]
-            )
+            if self.dbscan_index is None:
+                return [
+                    {
+                        "cluster": 0,
+                        "is_noise": False,
+                        "is_anomaly": False,
+                        "note": "DBSCAN core index not found; run retraining to build it"
+                    }
+                    for _ in range(len(X_scaled))
+                ]
             
-            # For single point, we'd typically compare against training clusters
-            # For now, we'll use a simplified approach
-            cluster_label = dbscan.fit_predict(X_scaled)[0]
-            is_noise = cluster_label == -1
+            cluster_labels = self.dbscan_index.predict(X_scaled)
             
-            return {
-                "cluster": int(cluster_label),
-                "is_noise": bool(is_noise),
-                "is_anomaly": bool(is_noise)
-            }
+            return [
+                {
+                    "cluster": int(cluster_label),
+                    "is_noise": bool(cluster_label == -1),
+                    "is_anomaly": bool(cluster_label == -1)
+                }
+                for cluster_label in cluster_labels
+            ]
         except Exception as e:
-            return {
-                "cluster": 0,
-                "is_noise": False,
-                "is_anomaly": False,
-                "error": str(e)
-            }
+            return [
+                {
+                    "cluster": 0,
+                    "is_noise": False,
+                    "is_anomaly": False,
+                    "error": str(e)
+                }
+                for _ in range(len(X_scaled))
+            ]
     
-    def _predict_lof(self, X_scaled: np.ndarray) -> Dict[str, Any]:
-        """Get LOF prediction."""
+    def _predict_lof(self, X_scaled: np.ndarray) -> List[Dict[str, Any]]:
+        """Get novelty-mode LOF predictions for every row."""
         try:
-            # Note: LOF with novelty=False can't predict on new data
-            # We'll use a workaround or retrain LOF with novelty=True if needed
-            # For now, return default values
-            return {
-                "prediction": 1,
-                "score": 1.0,
-                "is_anomaly": False,
-                "note": "LOF requires retraining with novelty=True for new predictions"
-            }
+            if not getattr(self.lof_model, "novelty", False):
+                # LOF with novelty=False can't predict on new data
+                return [
+                    {
+                        "prediction": 1,
+                        "score": 1.0,
+                        "is_anomaly": False,
+                        "note": "LOF requires retraining with novelty=True for new predictions"
+                    }
+                    for _ in range(len(X_scaled))
+                ]
+            
+            # Missing values sit at the training mean (0 in scaled space)
+            X = np.nan_to_num(X_scaled, nan=0.0, posinf=0.0, neginf=0.0)
+            
+            # One k-NN query per batch; predict() would repeat it via decision_function
+            scores = self.lof_model.score_samples(X)
+            is_outlier = scores - self.lof_model.offset_ < 0
+            
+            return [
+                {
+                    "prediction": -1 if outlier else 1,
+                    "score": float(score),
+                    "is_anomaly": bool(outlier)
+                }
+                for score, outlier in zip(scores, is_outlier)
+            ]
         except Exception as e:
-            return {
-                "prediction": 1,
-                "score": 1.0,
-                "is_anomaly": False,
-                "error": str(e)
-            }
+            return [
+                {
+                    "prediction": 1,
+                    "score": 1.0,
+                    "is_anomaly": False,
+                    "error": str(e)
+                }
+                for _ in range(len(X_scaled))
+            ]
     
-    def _ensemble_scoring(self, iso_result: Dict, dbscan_result: Dict, lof_result: Dict, df_features: pd.DataFrame = None) -> Dict[str, Any]:
+    def _ensemble_scoring(self, iso_result: Dict, dbscan_result: Dict, lof_result: Dict, transformed: Optional[FeatureTransformResult] = None, index: int = 0) -> Dict[str, Any]:
         """
         Combine predictions from all models into ensemble score.
         
         Uses weighted voting with confidence scoring based on model agreement.
-        Includes business logic overrides for extreme cases.
+        Includes business logic overrides for extreme cases, read from row
+        `index` of the transform result.
         """
         try:
             # Count anomaly votes
@@ -230,19 +311,13 @@ class SNAREAnomalyDetector:
             override_applied = False
             override_reason = ""
             
-            if df_features is not None and len(df_features) > 0:
-                features = df_features.iloc[0]
-                
-                # Debug: Print what we're actually getting
-                print(f"DEBUG - Feature columns: {list(df_features.columns)}")
-                print(f"DEBUG - Feature values: {dict(features)}")
+            if transformed is not None and len(transformed) > index:
+                features = transformed.row(index)
                 
                 # Override 1: Extremely low prices (obvious scams)
                 price = features.get('price', 0)
                 price_per_sqft = features.get('price_per_sqft', 0)
                 
-                print(f"DEBUG - price: {price}, price_per_sqft: {price_per_sqft}")
-                
                 # Much more aggressive thresholds since the models clearly suck
                 if price > 0 and price < 800:  # Less than $800/month is suspicious in most markets
                     is_anomaly = True
@@ -288,11 +363,6 @@ class SNAREAnomalyDetector:
             if override_applied:
                 result["business_logic_override"] = True
                 result["override_reason"] = override_reason
-                print(f"DEBUG - Override applied! Reason: {override_reason}")
-            else:
-                print(f"DEBUG - No override applied. is_anomaly: {is_anomaly}, votes: {anomaly_votes}")
-            
-            print(f"DEBUG - Final result: {result}")
             
             return result
             
@@ -304,10 +374,10 @@ class SNAREAnomalyDetector:
                 "error": str(e)
             }
     
-    def _analyze_features(self, df_features: pd.DataFrame) -> Dict[str, Any]:
-        """Analyze key features that might indicate suspicious behavior."""
+    def _analyze_features(self, transformed: FeatureTransformResult, index: int = 0) -> Dict[str, Any]:
+        """Analyze key features of one listing that might indicate suspicious behavior."""
         try:
-            features = df_features.iloc[0]  # First (and only) row
+            features = transformed.row(index)
             
             suspicious_indicators = []
             
@@ -321,6 +391,9 @@ class SNAREAnomalyDetector:
             if features.get('distance_from_city_center', 0) > 30:
                 suspicious_indicators.append("Far from city center")
             
+            if features.get('city_mismatch_flag', False):
+                suspicious_indicators.append(f"Listed city does not match location (nearest: {features.get('nearest_city')})")
+            
             # Language indicators
             if features.get('num_scam_phrases', 0) > 2:
                 suspicious_indicators.append("Multiple scam phrases detected")
@@ -328,6 +401,10 @@ class SNAREAnomalyDetector:
             if features.get('num_exclamations', 0) > 5:
                 suspicious_indicators.append("Excessive exclamation marks")
             
+            # Template indicators: lightly edited copies posted at different prices
+            if features.get('near_dup_count', 1) > 1 and features.get('near_dup_price_std', 0) > 200:
+                suspicious_indicators.append("Near-duplicate description posted at different prices")
+            
             # Missing info indicators
             missing_count = sum([
                 features.get('address_missing', False),
@@ -343,8 +420,10 @@ class SNAREAnomalyDetector:
                     "price": float(features.get('price', 0)),
                     "price_per_sqft": float(features.get('price_per_sqft', 0)),
                     "distance_from_city": float(features.get('distance_from_city_center', 0)),
+                    "nearest_city": features.get('nearest_city'),
                     "scam_phrases": int(features.get('num_scam_phrases', 0)),
-                    "description_length": int(features.get('description_length', 0))
+                    "description_length": int(features.get('description_length', 0)),
+                    "near_duplicates": int(features.get('near_dup_count', 1))
                 }
             }
             
@@ -361,8 +440,11 @@ class SNAREAnomalyDetector:
             "models_loaded": {
                 "isolation_forest": self.isolation_forest is not None,
                 "lof": self.lof_model is not None,
-                "dbscan_params": self.dbscan_params is not None
+                "dbscan_params": self.dbscan_params is not None,
+                "dbscan_index": self.dbscan_index is not None,
+                "geo_cluster_index": self.feature_pipeline.geo_index is not None
             },
+            "location_clusters": self.feature_pipeline.geo_index.summary() if self.feature_pipeline.geo_index is not None else {},
             "training_info": self.model_metadata.get("dataset_info", {}),
             "model_performance": self.model_metadata.get("ensemble_results", {}),
             "feature_count": len(self.feature_pipeline.get_feature_names())
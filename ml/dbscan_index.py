@@ -0,0 +1,85 @@
+"""
+SNARE DBSCAN Core-Point Index
+=============================
+
+DBSCAN has no predict step, so inference used to refit it on the single
+incoming row, which made every listing noise. Instead, retraining keeps the
+core samples DBSCAN found (and their cluster labels) in a KD-tree. A new
+listing joins the cluster of its nearest core sample if that sample lies
+within eps, exactly like a border point during training; otherwise it is
+noise. One tree query serves a whole batch.
+"""
+
+import os
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import KDTree
+
+INDEX_FILENAME = "dbscan_core_index.pkl"
+
+
+class DBSCANCoreIndex:
+    """Cluster assignment for new points against a fitted DBSCAN's core samples."""
+
+    def __init__(self, core_samples: np.ndarray, core_labels: np.ndarray, eps: float, min_samples: int,
+                 training_samples: int = 0, noise_points: int = 0):
+        self.eps = float(eps)
+        self.min_samples = int(min_samples)
+        self.core_labels = np.asarray(core_labels, dtype=np.int64)
+        self.tree = KDTree(np.asarray(core_samples, dtype=np.float64)) if len(self.core_labels) else None
+        self.training_samples = int(training_samples)
+        self.noise_points = int(noise_points)
+
+    @classmethod
+    def fit(cls, X: np.ndarray, eps: float, min_samples: int) -> "DBSCANCoreIndex":
+        """Run DBSCAN on the training matrix and index its core samples."""
+        X = np.asarray(X, dtype=np.float64)
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples).fit(X)
+        core = dbscan.core_sample_indices_
+        return cls(
+            X[core], dbscan.labels_[core], eps, min_samples,
+            training_samples=len(X), noise_points=int((dbscan.labels_ == -1).sum())
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Assign each row to a training cluster, or -1 for noise.
+
+        Non-finite values are replaced by 0, the training mean in scaled
+        feature space, so listings with a missing field still get a vote.
+        """
+        X = np.nan_to_num(np.asarray(X, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+        labels = np.full(len(X), -1, dtype=np.int64)
+        if self.tree is None or len(X) == 0:
+            return labels
+
+        distances, indices = self.tree.query(X, k=1)
+        within_eps = distances[:, 0] <= self.eps
+        labels[within_eps] = self.core_labels[indices[within_eps, 0]]
+        return labels
+
+    def summary(self) -> Dict[str, Any]:
+        """Index statistics for dbscan_params.json."""
+        return {
+            "eps": self.eps,
+            "min_samples": self.min_samples,
+            "training_samples": self.training_samples,
+            "core_samples": int(len(self.core_labels)),
+            "clusters_found": int(len(np.unique(self.core_labels))),
+            "noise_points": self.noise_points,
+            "index_file": INDEX_FILENAME
+        }
+
+    def save(self, models_dir: str) -> str:
+        """Persist the index (core samples, labels and KD-tree) into models_dir."""
+        path = os.path.join(models_dir, INDEX_FILENAME)
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(models_dir: str) -> "DBSCANCoreIndex":
+        """Load a persisted index from models_dir."""
+        return joblib.load(os.path.join(models_dir, INDEX_FILENAME))
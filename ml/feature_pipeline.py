@@ -17,6 +17,55 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 import re
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import BallTree
+
+from ml.geo_index import GeoClusterIndex, INDEX_FILENAME as GEO_INDEX_FILENAME
+from ml.phrase_matcher import ScamPhraseMatcher
+
+# Description patterns, compiled once at import
+PHONE_PATTERN = re.compile(r'\d{3}[-.\s]?\d{3}[-.\s]?\d{4}', re.IGNORECASE)
+EXCLAMATION_PATTERN = re.compile(r'!+')
+ALL_CAPS_PATTERN = re.compile(r'\b[A-Z]{2,}\b')
+
+# Engineered for analysis and reporting; only fed to the models when listed in feature_config
+CONTEXT_FEATURES = ['near_dup_count', 'near_dup_price_std',
+                    'nearest_city', 'nearest_city_distance', 'city_mismatch_flag']
+
+EARTH_RADIUS_KM = 6371
+# Distance used when a listing's location or claimed city is unknown
+UNKNOWN_CITY_DISTANCE_KM = 50.0
+
+# Raw fields the duplicate indexes need to identify and aggregate a listing
+INDEX_LOOKUP_COLUMNS = ('url', 'listing_name', 'description', 'price', 'square_footage', 'latitude', 'longitude')
+
+
+class FeatureTransformResult:
+    """
+    Engineered features for a batch of listings, produced in a single pass.
+    
+    Carries both the unscaled feature frame (used by Isolation Forest and the
+    business-logic overrides) and the scaled matrix (used by DBSCAN and LOF),
+    so consumers never have to re-run feature engineering. Context features
+    that the models were not trained on ride along in `context`.
+    """
+    
+    def __init__(self, features: pd.DataFrame, X_scaled: np.ndarray, context: Optional[pd.DataFrame] = None):
+        self.features = features
+        self.X_scaled = X_scaled
+        self.context = context if context is not None else pd.DataFrame(index=features.index)
+        self._rows = None
+    
+    def __len__(self) -> int:
+        return len(self.features)
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        """Return one listing's engineered and context features as a plain dict."""
+        if self._rows is None:
+            self._rows = self.features.to_dict('records')
+            for row, context in zip(self._rows, self.context.to_dict('records')):
+                for col, value in context.items():
+                    row.setdefault(col, value)
+        return self._rows[index]
 
 
 class SNAREFeaturePipeline:
@@ -31,13 +80,31 @@ class SNAREFeaturePipeline:
     - Metadata patterns (missing info, duplicates)
     """
     
-    def __init__(self, models_dir: str = "ml/"):
-        """Initialize the feature pipeline with saved model artifacts."""
+    def __init__(self, models_dir: str = "ml/", duplicate_index=None, near_duplicate_index=None):
+        """
+        Initialize the feature pipeline with saved model artifacts.
+        
+        Args:
+            models_dir: Directory holding the trained artifacts
+            duplicate_index: Optional db.duplicate_index.DuplicateIndex used for
+                the duplicate features; without it they keep single-listing defaults
+            near_duplicate_index: Optional db.minhash_index.NearDuplicateIndex used
+                for the near-duplicate features; same defaults without it
+        """
         self.models_dir = models_dir
+        self.duplicate_index = duplicate_index
+        self.near_duplicate_index = near_duplicate_index
         self.scaler = None
         self.feature_config = None
         self.city_centers = None
+        self.city_names = None
+        self.city_positions = None
+        self.city_coords = None
+        self.city_tree = None
         self.scam_words = None
+        self.scam_matcher = None
+        self.scam_flag_columns = {}
+        self.geo_index = None
         self.load_artifacts()
     
     def load_artifacts(self):
@@ -71,10 +138,30 @@ class SNAREFeaturePipeline:
                     # Handle flat structure: {city: {latitude: lat, longitude: lon}}
                     self.city_centers = city_centers_data
             
+            # Array-backed centers (radians) for vectorized distances and nearest-center queries
+            self.city_names = np.array(list(self.city_centers), dtype=object)
+            self.city_positions = {city: i for i, city in enumerate(self.city_names)}
+            self.city_coords = np.radians(np.array(
+                [[c['latitude'], c['longitude']] for c in self.city_centers.values()], dtype=np.float64
+            ).reshape(-1, 2))
+            self.city_tree = BallTree(self.city_coords, metric='haversine') if len(self.city_names) else None
+            
             # Load scam words list
             with open(os.path.join(self.models_dir, "scam_words.json"), 'r') as f:
                 scam_config = json.load(f)
                 self.scam_words = scam_config['scam_words']
+            self.scam_matcher = ScamPhraseMatcher(self.scam_words)
+            
+            # Per-phrase has_<word> flags the trained model expects as features
+            self.scam_flag_columns = {}
+            for i, word in enumerate(self.scam_words):
+                col_name = f'has_{word.replace(" ", "_")}'
+                if col_name in self.feature_config['features']:
+                    self.scam_flag_columns.setdefault(col_name, i)
+            
+            # Load location cluster index (written by retraining)
+            if os.path.exists(os.path.join(self.models_dir, GEO_INDEX_FILENAME)):
+                self.geo_index = GeoClusterIndex.load(self.models_dir)
             
             print(f"Feature pipeline artifacts loaded successfully from {self.models_dir}")
             
@@ -91,34 +178,89 @@ class SNAREFeaturePipeline:
         Returns:
             DataFrame with single row containing 23 engineered features
         """
+        return self.transform_listings([listing_data])
+    
+    def transform_listings(self, listings: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Transform a batch of raw listings into engineered features in one pass.
+        
+        Every engineering step runs once over the whole N-row frame, so a
+        2000-listing search result costs one vectorized pass instead of 2000.
+        
+        Args:
+            listings: Raw listing dicts from the scraper
+            
+        Returns:
+            DataFrame with one row of 23 engineered features per listing
+        """
+        return self._select_features(self._engineer_all(listings))
+    
+    def _engineer_all(self, listings: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Run every feature engineering step over the batch."""
         # Convert to DataFrame for consistent processing
-        df = pd.DataFrame([listing_data])
+        df = pd.DataFrame(listings)
+        df = self._fill_absent_keys(df, listings)
         
-        # Apply all feature engineering steps
+        # Apply all feature engineering steps (each adds its columns in place)
         df = self._engineer_temporal_features(df)
         df = self._engineer_linguistic_features(df)
         df = self._engineer_geographic_features(df)
         df = self._engineer_pricing_features(df)
         df = self._engineer_metadata_features(df)
         df = self._engineer_duplicate_features(df)
-        
-        # Select only the features expected by the model
+        df = self._engineer_near_duplicate_features(df)
+        return df
+    
+    def _select_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Select the model features (the one copy we make) and fill gaps."""
         feature_cols = self.feature_config['features']
         df_features = df[feature_cols].copy()
         
         # Handle missing values
-        df_features = self._handle_missing_values(df_features)
+        return self._handle_missing_values(df_features)
+    
+    def transform(self, listings: List[Dict[str, Any]]) -> FeatureTransformResult:
+        """
+        Engineer and scale features for a batch of listings in one pass.
+        
+        Args:
+            listings: Raw listing dicts from the scraper
+            
+        Returns:
+            FeatureTransformResult holding the feature frame and scaled matrix
+        """
+        df = self._engineer_all(listings)
+        df_features = self._select_features(df)
+        context = df[[col for col in CONTEXT_FEATURES if col in df.columns]]
+        return FeatureTransformResult(df_features, self.scale_features(df_features), context)
+    
+    def _fill_absent_keys(self, df: pd.DataFrame, listings: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Give rows that omit a key the same fallback a single listing gets.
         
-        return df_features
+        In a batch, a key missing from some listings becomes NaN, whereas a
+        one-row frame lacks the column entirely and the engineering steps
+        substitute a default. Filling those rows keeps batch results identical
+        to scoring each listing on its own.
+        """
+        absent_defaults = {
+            'time_posted': datetime.now(),
+            'city': "Unknown"
+        }
+        for col, default in absent_defaults.items():
+            if col in df.columns:
+                absent = [col not in listing for listing in listings]
+                if any(absent):
+                    df[col] = df[col].astype(object)
+                    df.loc[absent, col] = default
+        return df
     
     def _engineer_temporal_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer temporal pattern features."""
-        df = df.copy()
-        
         # Parse posting time (handle various formats)
         if 'time_posted' in df.columns:
             try:
-                df['time_posted'] = pd.to_datetime(df['time_posted'], utc=True, errors='coerce')
+                df['time_posted'] = pd.to_datetime(df['time_posted'], utc=True, errors='coerce', format='mixed')
             except:
                 df['time_posted'] = pd.NaT
         else:
@@ -133,39 +275,34 @@ class SNAREFeaturePipeline:
     
     def _engineer_linguistic_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer linguistic pattern features from description text."""
-        df = df.copy()
-        
         # Ensure description exists
         if 'description' not in df.columns:
             df['description'] = ""
         df['description'] = df['description'].fillna("").astype(str)
         
+        descriptions = df['description'].tolist()
+        
         # Basic text features
-        df['description_length'] = df['description'].str.len()
-        df['has_contact_info'] = df['description'].str.contains(r'\d{3}[-.\s]?\d{3}[-.\s]?\d{4}', regex=True, case=False)
-        df['num_exclamations'] = df['description'].str.count(r'!+')
-        df['num_all_caps'] = df['description'].str.findall(r'\b[A-Z]{2,}\b').str.len()
+        df['description_length'] = [len(text) for text in descriptions]
+        df['has_contact_info'] = [PHONE_PATTERN.search(text) is not None for text in descriptions]
+        df['num_exclamations'] = [len(EXCLAMATION_PATTERN.findall(text)) for text in descriptions]
+        df['num_all_caps'] = [len(ALL_CAPS_PATTERN.findall(text)) for text in descriptions]
         
-        # Scam phrase detection
-        desc_clean = df['description'].str.lower().str.strip()
+        # Scam phrase detection: one scan per description finds every phrase
+        phrase_flags = self.scam_matcher.match_matrix(descriptions)
         
-        # Individual scam word flags
-        for word in self.scam_words:
-            col_name = f'has_{word.replace(" ", "_")}'
-            df[col_name] = desc_clean.str.contains(word, regex=False, case=False)
+        # Individual scam word flags (only those the model config uses become columns)
+        for col_name, i in self.scam_flag_columns.items():
+            df[col_name] = phrase_flags[:, i]
         
         # Aggregate scam metrics
-        df['num_scam_phrases'] = sum(
-            df[f'has_{word.replace(" ", "_")}'] for word in self.scam_words
-        )
+        df['num_scam_phrases'] = phrase_flags.sum(axis=1)
         df['scam_phrase_density'] = df['num_scam_phrases'] / np.maximum(df['description_length'], 1)
         
         return df
     
     def _engineer_geographic_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer geographic pattern features."""
-        df = df.copy()
-        
         # Ensure geographic coordinates exist
         if 'latitude' not in df.columns:
             df['latitude'] = np.nan
@@ -174,38 +311,82 @@ class SNAREFeaturePipeline:
         if 'city' not in df.columns:
             df['city'] = "Unknown"
         
-        # Distance from city center calculation
-        df['distance_from_city_center'] = df.apply(self._calculate_city_distance, axis=1)
-        
-        # Location clustering (simplified for single listing)
-        # For production, you might want to cluster against existing database
-        df['location_cluster'] = 0  # Default cluster
-        df['location_is_noise'] = False  # Default not noise
+        df = self._engineer_city_distance_features(df)
+        
+        # Location clustering against the persisted geo index; listings without
+        # coordinates (or without an index) keep the default cluster
+        df['location_cluster'] = 0
+        df['location_is_noise'] = False
+        if self.geo_index is not None:
+            lat = pd.to_numeric(df['latitude'], errors='coerce')
+            lon = pd.to_numeric(df['longitude'], errors='coerce')
+            located = (lat.notna() & lon.notna()).to_numpy()
+            if located.any():
+                clusters = self.geo_index.predict(lat[located], lon[located])
+                df.loc[located, 'location_cluster'] = clusters
+                df.loc[located, 'location_is_noise'] = clusters == -1
         
         return df
     
-    def _calculate_city_distance(self, row) -> float:
-        """Calculate distance from listing to city center."""
-        try:
-            lat, lon = row['latitude'], row['longitude']
-            city = row['city']
-            
-            if pd.isna(lat) or pd.isna(lon) or city not in self.city_centers:
-                return 50.0  # Default distance for unknown locations
-            
-            city_lat = self.city_centers[city]['latitude']
-            city_lon = self.city_centers[city]['longitude']
-            
-            return self._haversine_distance(lat, lon, city_lat, city_lon)
-            
-        except Exception:
-            return 50.0  # Fallback distance
+    def observe_listings(self, listings: List[Dict[str, Any]]) -> int:
+        """
+        Fold newly stored listings into the location cluster index.
+        
+        Returns:
+            Number of listings with coordinates that were added
+        """
+        if self.geo_index is None or not listings:
+            return 0
+        coords = pd.DataFrame(listings).reindex(columns=['latitude', 'longitude'])
+        return self.geo_index.add_points(
+            pd.to_numeric(coords['latitude'], errors='coerce'),
+            pd.to_numeric(coords['longitude'], errors='coerce')
+        )
     
-    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate haversine distance between two points in kilometers."""
-        R = 6371  # Earth radius in km
+    def _engineer_city_distance_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Distance to the claimed city's center and to the nearest known center.
+        
+        Both are vectorized over the batch: the claimed center is looked up by
+        array position and the nearest one with a haversine BallTree query.
+        """
+        lat = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=np.float64)
+        lon = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=np.float64)
+        located = np.isfinite(lat) & np.isfinite(lon)
+        lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+        
+        # Claimed city: unknown cities and missing coordinates keep the default distance
+        claimed = df['city'].map(self.city_positions).fillna(-1).to_numpy(dtype=np.int64)
+        known = located & (claimed >= 0)
+        claimed_distance = np.full(len(df), UNKNOWN_CITY_DISTANCE_KM)
+        if known.any():
+            centers = self.city_coords[claimed[known]]
+            claimed_distance[known] = self._haversine_distance(lat_rad[known], lon_rad[known], centers[:, 0], centers[:, 1])
+        df['distance_from_city_center'] = claimed_distance
+        
+        # Nearest center regardless of the claimed city
+        nearest_distance = np.full(len(df), np.nan)
+        nearest_city = np.full(len(df), None, dtype=object)
+        if self.city_tree is not None and located.any():
+            distances, indices = self.city_tree.query(np.column_stack([lat_rad[located], lon_rad[located]]), k=1)
+            nearest_distance[located] = distances[:, 0] * EARTH_RADIUS_KM
+            nearest_city[located] = self.city_names[indices[:, 0]]
+        df['nearest_city_distance'] = nearest_distance
+        df['nearest_city'] = pd.Series(nearest_city, index=df.index, dtype=object)
+        
+        # Claimed a city, but the coordinates sit closer to another center
+        claimed_name = df['city'].where(df['city'].notna(), "").astype(str).str.strip().str.lower()
+        nearest_name = df['nearest_city'].fillna("").astype(str).str.lower()
+        df['city_mismatch_flag'] = (
+            located & ~claimed_name.isin(["", "unknown"]).to_numpy() & (claimed_name != nearest_name).to_numpy()
+        )
+        
+        return df
+    
+    def _haversine_distance(self, lat1, lon1, lat2, lon2):
+        """Haversine distance in kilometers between points given in radians (scalars or arrays)."""
+        R = EARTH_RADIUS_KM
         
-        lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
         dlat = lat2 - lat1
         dlon = lon2 - lon1
         
@@ -216,8 +397,6 @@ class SNAREFeaturePipeline:
     
     def _engineer_pricing_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer pricing pattern features."""
-        df = df.copy()
-        
         # Ensure price and square footage exist (but don't override with defaults)
         if 'price' not in df.columns:
             df['price'] = np.nan  # Don't default to 0, let it be NaN if missing
@@ -247,8 +426,6 @@ class SNAREFeaturePipeline:
     
     def _engineer_metadata_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer metadata pattern features."""
-        df = df.copy()
-        
         # Missing address information flags
         df['address_missing'] = df.get('address', '').isna() | (df.get('address', '') == '') | df.get('address', '').str.strip().eq('')
         df['city_missing'] = df.get('city', '').isna() | (df.get('city', '') == '') | df.get('city', '').str.strip().eq('')
@@ -259,23 +436,57 @@ class SNAREFeaturePipeline:
         return df
     
     def _engineer_duplicate_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Engineer duplicate pattern features (simplified for single listing)."""
-        df = df.copy()
+        """Engineer duplicate pattern features from the duplicate index."""
+        if self.duplicate_index is None:
+            # Without the index, these are single-listing defaults
+            df['name_dup_count'] = 1
+            df['desc_dup_count'] = 1
+            df['price_std_in_desc'] = 0
+            df['sqft_std_in_desc'] = 0
+            df['desc_mismatch_flag'] = False
+            df['desc_grouped'] = False
+            return df
+        
+        lookup_cols = [col for col in INDEX_LOOKUP_COLUMNS if col in df.columns]
+        duplicates = pd.DataFrame(
+            self.duplicate_index.lookup(df[lookup_cols].to_dict('records')),
+            index=df.index
+        )
+        
+        df['name_dup_count'] = duplicates['name_dup_count']
+        df['desc_dup_count'] = duplicates['desc_dup_count']
+        df['price_std_in_desc'] = duplicates['price_std_in_desc'].fillna(0)
+        df['sqft_std_in_desc'] = duplicates['sqft_std_in_desc'].fillna(0)
         
-        # For single listing, these are defaults (would be calculated against database in production)
-        df['name_dup_count'] = 1
-        df['desc_dup_count'] = 1
-        df['price_std_in_desc'] = 0
-        df['sqft_std_in_desc'] = 0
-        df['desc_mismatch_flag'] = False
-        df['desc_grouped'] = False
+        # Same rule as the notebook: reposted text with inconsistent price or size
+        df['desc_mismatch_flag'] = (
+            (df['desc_dup_count'] > 1) &
+            ((duplicates['price_std_in_desc'] > 200) | (duplicates['sqft_std_in_desc'] > 100))
+        )
+        df['desc_grouped'] = df['desc_dup_count'] > 1
+        
+        return df
+    
+    def _engineer_near_duplicate_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Engineer near-duplicate (lightly edited template) features from the MinHash index."""
+        if self.near_duplicate_index is None:
+            df['near_dup_count'] = 1
+            df['near_dup_price_std'] = 0.0
+            return df
+        
+        lookup_cols = [col for col in INDEX_LOOKUP_COLUMNS if col in df.columns]
+        near_duplicates = pd.DataFrame(
+            self.near_duplicate_index.lookup(df[lookup_cols].to_dict('records')),
+            index=df.index
+        )
+        
+        df['near_dup_count'] = near_duplicates['near_dup_count']
+        df['near_dup_price_std'] = near_duplicates['near_dup_price_std'].fillna(0)
         
         return df
     
     def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         """Handle missing values in engineered features."""
-        df = df.copy()
-        
         # Fill numeric features with appropriate defaults
         numeric_defaults = {
             'latitude': 27.7663,  # Florida center
@@ -290,6 +501,7 @@ class SNAREFeaturePipeline:
             'price_per_sqft': 2.0,
             'location_cluster': 0,
             'desc_dup_count': 1,
+            'near_dup_count': 1,
             'description_length': 100,
             'num_scam_phrases': 0,
             'scam_phrase_density': 0.0,
@@ -323,10 +535,8 @@ class SNAREFeaturePipeline:
         Returns:
             Scaled feature array ready for model prediction
         """
-        # Transform to features
-        df_features = self.transform_listing(listing_data)
-        
-        # Apply scaling
-        X_scaled = self.scaler.transform(df_features)
-        
-        return X_scaled
+        return self.transform([listing_data]).X_scaled
+    
+    def scale_features(self, df_features: pd.DataFrame) -> np.ndarray:
+        """Apply the fitted scaler to an N-row engineered feature frame."""
+        return self.scaler.transform(df_features)
@@ -0,0 +1,215 @@
+"""
+SNARE Geo Cluster Index
+=======================
+
+Persisted replacement for the notebook's location DBSCAN (lat/lon in degrees,
+eps=0.01, min_samples=5). Retraining runs that DBSCAN once over every stored
+listing and keeps the points in a grid of eps-sized cells, so:
+
+- a new listing's cluster is read from the core points in the 3x3 block of
+  cells around it (constant time), exactly like a DBSCAN border point;
+  listings with no core point within eps are noise, which is what a fake
+  listing dropped into an empty area looks like
+- newly scraped listings are inserted incrementally: neighbour counts are
+  bumped, points that reach min_samples are promoted to core, and clusters
+  that become density-connected are merged with a union-find over labels
+"""
+
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+
+INDEX_FILENAME = "geo_cluster_index.pkl"
+
+
+class GeoClusterIndex:
+    """Grid-bucketed DBSCAN over listing coordinates with incremental inserts."""
+
+    def __init__(self, eps: float = 0.01, min_samples: int = 5):
+        self.eps = float(eps)
+        self.min_samples = int(min_samples)
+        self._size = 0
+        self._coords = np.empty((0, 2), dtype=np.float64)
+        self._counts = np.empty(0, dtype=np.int64)  # neighbours within eps, self included
+        self._labels = np.empty(0, dtype=np.int64)  # -1 for noise
+        self._core = np.empty(0, dtype=bool)
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._parent: Dict[int, int] = {}  # union-find over cluster labels
+        self._next_label = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def fit(cls, latitudes: Iterable[float], longitudes: Iterable[float],
+            eps: float = 0.01, min_samples: int = 5) -> "GeoClusterIndex":
+        """Run the notebook's location DBSCAN and index its result. Non-finite coordinates are skipped."""
+        index = cls(eps, min_samples)
+        coords = np.column_stack([np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)])
+        coords = coords[np.isfinite(coords).all(axis=1)]
+        if len(coords) == 0:
+            return index
+
+        dbscan = DBSCAN(eps=index.eps, min_samples=index.min_samples).fit(coords)
+        neighbourhoods = NearestNeighbors(radius=index.eps).fit(coords).radius_neighbors(coords, return_distance=False)
+
+        index._size = len(coords)
+        index._coords = coords
+        index._counts = np.fromiter((len(n) for n in neighbourhoods), dtype=np.int64, count=len(coords))
+        index._labels = dbscan.labels_.astype(np.int64)
+        index._core = np.zeros(len(coords), dtype=bool)
+        index._core[dbscan.core_sample_indices_] = True
+        for i, (lat, lon) in enumerate(coords):
+            index._cells.setdefault(index._cell(lat, lon), []).append(i)
+
+        labels = np.unique(index._labels[index._labels >= 0])
+        index._parent = {int(label): int(label) for label in labels}
+        index._next_label = int(labels.max()) + 1 if len(labels) else 0
+        return index
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.eps), math.floor(lon / self.eps)
+
+    def _neighbours(self, lat: float, lon: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids of indexed points within eps, and their distances."""
+        row, col = self._cell(lat, lon)
+        ids = [i for dr in (-1, 0, 1) for dc in (-1, 0, 1) for i in self._cells.get((row + dr, col + dc), ())]
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids = np.array(ids, dtype=np.int64)
+        distances = np.hypot(self._coords[ids, 0] - lat, self._coords[ids, 1] - lon)
+        within = distances <= self.eps
+        return ids[within], distances[within]
+
+    def _root(self, label: int) -> int:
+        if label < 0:
+            return label
+        root = label
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[label] != root:
+            self._parent[label], label = root, self._parent[label]
+        return root
+
+    def predict(self, latitudes: Iterable[float], longitudes: Iterable[float]) -> np.ndarray:
+        """
+        Cluster id of the nearest core point within eps for each coordinate, or -1 for noise.
+
+        Coordinates must be finite.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        clusters = np.full(len(latitudes), -1, dtype=np.int64)
+        with self._lock:
+            for i, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+                ids, distances = self._neighbours(lat, lon)
+                core = self._core[ids]
+                if core.any():
+                    nearest = ids[core][np.argmin(distances[core])]
+                    clusters[i] = self._root(int(self._labels[nearest]))
+        return clusters
+
+    def add_points(self, latitudes: Iterable[float], longitudes: Iterable[float]) -> int:
+        """Insert new listing coordinates, updating clusters incrementally. Returns the number added."""
+        added = 0
+        with self._lock:
+            for lat, lon in zip(latitudes, longitudes):
+                lat, lon = float(lat), float(lon)
+                if not (math.isfinite(lat) and math.isfinite(lon)):
+                    continue
+                ids, _ = self._neighbours(lat, lon)
+                point = self._append(lat, lon, count=len(ids) + 1)
+
+                self._counts[ids] += 1
+                promoted = ids[~self._core[ids] & (self._counts[ids] >= self.min_samples)].tolist()
+                if self._counts[point] >= self.min_samples:
+                    promoted.append(point)
+                for core_point in promoted:
+                    self._promote(core_point)
+
+                # Otherwise a border point of the nearest cluster, or noise
+                if not self._core[point]:
+                    ids, distances = self._neighbours(lat, lon)
+                    core = self._core[ids]
+                    if core.any():
+                        self._labels[point] = self._labels[ids[core][np.argmin(distances[core])]]
+                added += 1
+        return added
+
+    def _append(self, lat: float, lon: float, count: int) -> int:
+        if self._size == len(self._coords):
+            capacity = max(64, 2 * self._size)
+            self._coords = np.resize(self._coords, (capacity, 2))
+            self._counts = np.resize(self._counts, capacity)
+            self._labels = np.resize(self._labels, capacity)
+            self._core = np.resize(self._core, capacity)
+        point = self._size
+        self._coords[point] = (lat, lon)
+        self._counts[point] = count
+        self._labels[point] = -1
+        self._core[point] = False
+        self._cells.setdefault(self._cell(lat, lon), []).append(point)
+        self._size += 1
+        return point
+
+    def _promote(self, point: int):
+        """Make point a core point, merging every cluster it now density-connects."""
+        self._core[point] = True
+        ids, _ = self._neighbours(*self._coords[point])
+        roots = {self._root(int(label)) for label in self._labels[ids[self._core[ids]]] if label >= 0}
+
+        if roots:
+            label = min(roots)
+            for other in roots:
+                self._parent[other] = label
+        else:
+            label = self._next_label
+            self._parent[label] = label
+            self._next_label += 1
+
+        self._labels[point] = label
+        border = ids[self._labels[ids] < 0]
+        self._labels[border] = label
+
+    def summary(self) -> Dict[str, Any]:
+        """Index statistics for model info."""
+        with self._lock:
+            labels = self._labels[:self._size]
+            roots = {self._root(int(label)) for label in np.unique(labels[labels >= 0])}
+            return {
+                "eps": self.eps,
+                "min_samples": self.min_samples,
+                "points": self._size,
+                "core_points": int(self._core[:self._size].sum()),
+                "clusters": len(roots),
+                "noise_points": int((labels < 0).sum()),
+                "index_file": INDEX_FILENAME
+            }
+
+    def save(self, models_dir: str) -> str:
+        """Persist the index into models_dir."""
+        path = os.path.join(models_dir, INDEX_FILENAME)
+        with self._lock:
+            joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(models_dir: str) -> "GeoClusterIndex":
+        """Load a persisted index from models_dir."""
+        return joblib.load(os.path.join(models_dir, INDEX_FILENAME))
@@ -0,0 +1,86 @@
+"""
+SNARE Scam Phrase Matcher
+=========================
+
+Finds every scam phrase in a description with a single regex scan.
+
+The phrase list is compiled once into a trie-shaped alternation wrapped in a
+lookahead, so the regex engine walks each description once and, at every
+position, follows at most one trie branch. Cost grows with description length
+and phrase depth rather than with the number of phrases, which keeps the
+linguistic features cheap as scam_words.json grows into the hundreds.
+"""
+
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class ScamPhraseMatcher:
+    """
+    Precompiled multi-phrase matcher with substring semantics.
+
+    Matches are case-insensitive and behave like `phrase in description`,
+    i.e. the same results as one `str.contains(phrase, regex=False)` pass per
+    phrase, including phrases that overlap or prefix one another.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        """Compile the matcher for phrases, keeping their original order."""
+        self.phrases = list(phrases)
+
+        # Position(s) of each distinct lowercased phrase in self.phrases
+        positions: Dict[str, List[int]] = {}
+        for i, phrase in enumerate(self.phrases):
+            if phrase:
+                positions.setdefault(phrase.lower(), []).append(i)
+
+        # The scan reports the longest phrase starting at each position; every
+        # shorter phrase that is a prefix of it starts there too
+        self._hits: Dict[str, np.ndarray] = {
+            key: np.array(sorted(i for other, idx in positions.items() if key.startswith(other) for i in idx))
+            for key in positions
+        }
+        self._pattern = re.compile(f"(?=({self._trie_pattern(positions)}))", re.DOTALL) if positions else None
+
+    @staticmethod
+    def _trie_pattern(phrases: Iterable[str]) -> str:
+        """Build a greedy regex alternation shaped like the phrase trie."""
+        trie: Dict[str, dict] = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[''] = {}  # end-of-phrase marker
+
+        def render(node: Dict[str, dict]) -> str:
+            branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+            # A phrase may end here: make the longer continuation optional (greedy)
+            return f"(?:{body})?" if '' in node else body
+
+        return render(trie)
+
+    def match_matrix(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        Flag which phrases occur in each text.
+
+        Args:
+            texts: Descriptions to scan (one pass each)
+
+        Returns:
+            Boolean array of shape (n_texts, n_phrases), columns in phrase order
+        """
+        texts = list(texts)
+        flags = np.zeros((len(texts), len(self.phrases)), dtype=bool)
+        if self._pattern is None:
+            return flags
+
+        for row, text in enumerate(texts):
+            for match in self._pattern.finditer(text.lower().strip()):
+                flags[row, self._hits[match.group(1)]] = True
+
+        return flags
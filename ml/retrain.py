@@ -1,6 +1,95 @@
+import json
 import os
+import joblib
 import pandas as pd
-from ml.anomaly_detection import retrain_model
+from datetime import datetime
+from sklearn.ensemble import IsolationForest
+from sklearn.neighbors import LocalOutlierFactor
+
+from db.duplicate_index import DuplicateIndex
+from db.minhash_index import NearDuplicateIndex
+from ml.dbscan_index import DBSCANCoreIndex
+from ml.feature_pipeline import SNAREFeaturePipeline
+from ml.geo_index import GeoClusterIndex
+
+
+def fit_novelty_lof(X_scaled, n_neighbors=20, contamination=0.1, algorithm="kd_tree"):
+    """
+    Fits a novelty-mode LOF that can score listings it was not trained on.
+
+    The fitted model keeps its k-NN index (a KD-tree over the training
+    matrix) and the training points' k-distances and local reachability
+    densities, so pickling it persists everything score_samples needs.
+    """
+    lof = LocalOutlierFactor(
+        n_neighbors=n_neighbors,
+        contamination=contamination,
+        novelty=True,
+        algorithm=algorithm
+    )
+    return lof.fit(X_scaled)
+
+def retrain_model(initial_df, new_df, models_dir="ml/"):
+    """
+    Refits Isolation Forest, LOF and DBSCAN on the combined listings and saves them.
+
+    The location DBSCAN (eps=0.01, min_samples=5 over lat/lon) is rebuilt
+    first and persisted as a grid-bucketed index, so the location_cluster
+    and location_is_noise features match between training and inference.
+
+    DBSCAN is persisted as a core-point index (core samples, their cluster
+    labels and a KD-tree) so inference can assign new listings to the
+    training clusters instead of refitting per request. LOF is fitted in
+    novelty mode for the same reason.
+    """
+    listings = pd.concat([initial_df, new_df], ignore_index=True).to_dict('records')
+
+    # Duplicate features over the training corpus, as the API sees them for stored listings
+    duplicate_index = DuplicateIndex(":memory:")
+    duplicate_index.add_listings(listings)
+    near_duplicate_index = NearDuplicateIndex(":memory:")
+    near_duplicate_index.add_listings(listings)
+
+    # Same feature code and scaler the API uses at inference time
+    pipeline = SNAREFeaturePipeline(models_dir, duplicate_index=duplicate_index,
+                                    near_duplicate_index=near_duplicate_index)
+
+    coords = pd.DataFrame(listings).reindex(columns=['latitude', 'longitude']).apply(pd.to_numeric, errors='coerce')
+    pipeline.geo_index = GeoClusterIndex.fit(coords['latitude'], coords['longitude'], eps=0.01, min_samples=5)
+    pipeline.geo_index.save(models_dir)
+    df_features = pipeline.transform_listings(listings).dropna()
+    X_scaled = pipeline.scale_features(df_features)
+
+    iso_forest = IsolationForest(n_estimators=100, contamination='auto', random_state=42)
+    iso_forest.fit(df_features)
+    joblib.dump(iso_forest, os.path.join(models_dir, "isolation_forest_model.pkl"))
+
+    lof = fit_novelty_lof(X_scaled)
+    joblib.dump(lof, os.path.join(models_dir, "lof_model.pkl"))
+    with open(os.path.join(models_dir, "lof_metadata.json"), 'w') as f:
+        json.dump({
+            "model_type": "LocalOutlierFactor",
+            "training_date": datetime.now().isoformat(),
+            "training_samples": int(len(X_scaled)),
+            "n_neighbors": lof.n_neighbors_,
+            "contamination": lof.contamination,
+            "novelty": True,
+            "algorithm": lof.algorithm
+        }, f, indent=2)
+
+    # Keep eps/min_samples from the current parameters
+    params_path = os.path.join(models_dir, "dbscan_params.json")
+    with open(params_path, 'r') as f:
+        dbscan_params = json.load(f)
+
+    dbscan = DBSCANCoreIndex.fit(X_scaled, dbscan_params["eps"], dbscan_params["min_samples"])
+    dbscan.save(models_dir)
+
+    dbscan_params.update(dbscan.summary())
+    with open(params_path, 'w') as f:
+        json.dump(dbscan_params, f, indent=2)
+
+    return iso_forest, lof, dbscan
 
 def retrain_if_needed():
     """
@@ -16,8 +105,8 @@ def retrain_if_needed():
 
     # If we have enough new listings, retrain the model
     if len(new_df) >= 100:  # Retrain after every 100 new listings
-        iso_forest, dbscan = retrain_model(initial_df, new_df)
+        iso_forest, lof, dbscan = retrain_model(initial_df, new_df)
         print("Model retrained successfully.")
-        
+
         # Optionally, remove the new listings file after retraining
         os.remove("data/new_listings.csv")